@@ -1,29 +1,210 @@
-from fastapi import FastAPI
+from fastapi import Body, FastAPI, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from pymongo import AsyncMongoClient
+from pymongo.errors import (
+    BulkWriteError,
+    ConnectionFailure,
+    ExecutionTimeout,
+    PyMongoError,
+)
+from pydantic import BaseModel, ConfigDict, EmailStr
+from typing import Annotated, List, Optional
+from contextlib import asynccontextmanager
 from datetime import datetime
 from enum import Enum
+import asyncio
+import logging
 import os
+import orjson
+
+# Logging is configured before anything below can log
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# MongoDB connection (uses Railway environment variable)
+MONGO_URL = os.environ.get("MONGO_URL")
+MONGO_MIN_POOL_SIZE = 5
+client = AsyncMongoClient(
+    MONGO_URL,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxPoolSize=50,
+    maxIdleTimeMS=60000,
+    serverSelectionTimeoutMS=5000,
+    maxConnecting=4,
+)
+db = client["portfolio_db"]
+
+# Open the minimum pool up front so the first requests don't pay for it
+async def prewarm_mongo_pool():
+    try:
+        await asyncio.gather(
+            *(client.admin.command("ping") for _ in range(MONGO_MIN_POOL_SIZE))
+        )
+    except PyMongoError as e:
+        logger.warning("MongoDB pool pre-warm failed: %s", e)
+
+ensure_indexes_task: Optional[asyncio.Task] = None
+
+async def ensure_indexes():
+    try:
+        await db.consultations.create_index([("submitted_at", -1)])
+    except PyMongoError as e:
+        logger.warning("Creating MongoDB indexes failed: %s", e)
+
+# Consultation inserts are queued and written in batches
+BATCH_MAX_SIZE = 64
+BATCH_WINDOW_SECONDS = 0.01
+BATCH_MAX_CONCURRENT_WRITES = 4
+INSERT_TIMEOUT_SECONDS = 10
+pending_inserts: Optional[asyncio.Queue] = None
+batch_insert_task: Optional[asyncio.Task] = None
+batch_write_slots: Optional[asyncio.Semaphore] = None
+batch_write_tasks: set = set()
+# Futures whose documents have been handed to insert_many
+inserts_in_flight: set = set()
+
+# The consultation was never sent to MongoDB, so resubmitting is safe
+class ConsultationNotSaved(Exception):
+    pass
+
+# The insert was sent but didn't finish in time; it may still be written
+class ConsultationSaveUnknown(Exception):
+    pass
+
+async def write_batch(batch: list):
+    try:
+        # Callers that timed out before their write started were told it
+        # wasn't saved, so their documents must not be written now
+        batch = [(doc, future) for doc, future in batch if not future.done()]
+        if not batch:
+            return
+        futures = [future for _, future in batch]
+        inserts_in_flight.update(futures)
+        docs = [doc for doc, _ in batch]
+        errors = {}
+        try:
+            await db.consultations.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = {err["index"]: e for err in e.details.get("writeErrors", [])}
+        except Exception as e:
+            errors = {i: e for i in range(len(batch))}
+        finally:
+            inserts_in_flight.difference_update(futures)
+    finally:
+        batch_write_slots.release()
+
+    for i, (doc, future) in enumerate(batch):
+        if future.done():
+            continue
+        if i in errors:
+            future.set_exception(errors[i])
+        else:
+            future.set_result(doc["_id"])
+
+async def batch_insert_worker():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await pending_inserts.get()]
+        try:
+            # A lone submission is written straight away; only wait for
+            # more when others are already queued behind it
+            if not pending_inserts.empty():
+                deadline = loop.time() + BATCH_WINDOW_SECONDS
+                while len(batch) < BATCH_MAX_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(pending_inserts.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+            # A slow write only holds up its own batch, up to the concurrency cap
+            await batch_write_slots.acquire()
+        except BaseException:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(ConsultationNotSaved("Consultation insert worker stopped"))
+            raise
+        task = asyncio.create_task(write_batch(batch))
+        batch_write_tasks.add(task)
+        task.add_done_callback(batch_write_tasks.discard)
+
+def fail_pending_inserts(exc: BaseException):
+    while not pending_inserts.empty():
+        _, future = pending_inserts.get_nowait()
+        if not future.done():
+            future.set_exception(exc)
+
+def on_batch_insert_worker_done(task: asyncio.Task):
+    if task.cancelled():
+        return
+    exc = task.exception()
+    logger.error("Consultation insert worker stopped", exc_info=exc)
+    fail_pending_inserts(ConsultationNotSaved("Consultation insert worker is not running"))
+
+async def queue_insert(doc: dict):
+    if batch_insert_task is None or batch_insert_task.done():
+        raise ConsultationNotSaved("Consultation insert worker is not running")
+    future = asyncio.get_running_loop().create_future()
+    await pending_inserts.put((doc, future))
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), INSERT_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        if future.done():
+            return future.result()
+        in_flight = future in inserts_in_flight
+        # Cancelling drops the document if its batch hasn't been written yet
+        future.cancel()
+        if in_flight:
+            raise ConsultationSaveUnknown("Consultation insert did not finish in time")
+        raise ConsultationNotSaved("Timed out waiting to write the consultation")
+
+# Startup warms the pool, builds indexes and starts the insert worker;
+# shutdown drains the worker and closes the client
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global ensure_indexes_task, pending_inserts, batch_insert_task, batch_write_slots
+    await prewarm_mongo_pool()
+    # Don't hold up startup; create_index is a no-op once the index exists
+    ensure_indexes_task = asyncio.create_task(ensure_indexes())
+    pending_inserts = asyncio.Queue()
+    batch_write_slots = asyncio.Semaphore(BATCH_MAX_CONCURRENT_WRITES)
+    batch_insert_task = asyncio.create_task(batch_insert_worker())
+    batch_insert_task.add_done_callback(on_batch_insert_worker_done)
+    yield
+    # Shutdown: stop taking batches, let in-flight writes finish, then close
+    batch_insert_task.cancel()
+    ensure_indexes_task.cancel()
+    if batch_write_tasks:
+        await asyncio.wait(batch_write_tasks, timeout=INSERT_TIMEOUT_SECONDS)
+    fail_pending_inserts(ConsultationNotSaved("Server is shutting down"))
+    await client.close()
 
 # Create FastAPI app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Allow your frontend to talk to this backend
+# (comma-separated list of origins in CORS_ORIGINS)
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in (os.environ.get("CORS_ORIGINS") or "*").split(",")
+    if origin.strip()
+]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
+    allow_origins=CORS_ORIGINS,
+    # Never send credentials to arbitrary origins
+    allow_credentials="*" not in CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,
 )
 
-# MongoDB connection (uses Railway environment variable)
-MONGO_URL = os.environ.get("MONGO_URL")
-client = AsyncIOMotorClient(MONGO_URL)
-db = client["portfolio_db"]
-
 # Consultation types
 class InquiryType(str, Enum):
     advisory = "advisory"
@@ -34,22 +215,14 @@ class InquiryType(str, Enum):
 
 # What the form sends
 class ConsultationCreate(BaseModel):
-    name: str
-    email: EmailStr
-    company: str
-    title: str
-    inquiry_type: InquiryType
-    message: str
+    model_config = ConfigDict(str_strip_whitespace=True)
 
-# What we store
-class Consultation(BaseModel):
     name: str
     email: EmailStr
     company: str
     title: str
     inquiry_type: InquiryType
     message: str
-    submitted_at: datetime = Field(default_factory=datetime.utcnow)
 
 # Response back to frontend
 class ConsultationResponse(BaseModel):
@@ -57,37 +230,127 @@ class ConsultationResponse(BaseModel):
     message: str
     consultation_id: Optional[str] = None
 
+class BulkConsultationResponse(BaseModel):
+    success: bool
+    message: str
+    consultation_ids: List[str] = []
+    failed_indexes: List[int] = []
+
+# Outages and timeouts are reported as 503 so clients know to retry
+@app.exception_handler(ConnectionFailure)
+@app.exception_handler(ExecutionTimeout)
+async def mongo_unavailable_handler(request: Request, exc: PyMongoError):
+    logger.error("MongoDB unavailable on %s %s: %r", request.method, request.url.path, exc)
+    return ORJSONResponse(
+        {"success": False, "message": "Database is temporarily unavailable, please try again."},
+        status_code=503,
+    )
+
+# The submission never reached MongoDB, so a retry can't duplicate it
+@app.exception_handler(ConsultationNotSaved)
+async def not_saved_handler(request: Request, exc: ConsultationNotSaved):
+    logger.error("Consultation not saved on %s %s: %s", request.method, request.url.path, exc)
+    return ORJSONResponse(
+        {"success": False, "message": "Your request was not saved, please try again."},
+        status_code=503,
+    )
+
+# The write may still land, so don't ask the client to resubmit
+@app.exception_handler(ConsultationSaveUnknown)
+async def save_unknown_handler(request: Request, exc: ConsultationSaveUnknown):
+    logger.error("Consultation save unconfirmed on %s %s: %s", request.method, request.url.path, exc)
+    return ORJSONResponse(
+        {"success": False, "message": "Your request may have been saved; please don't resubmit it."},
+        status_code=504,
+    )
+
+# Anything else from MongoDB (write errors, duplicate keys...) won't go
+# away on retry, so it is reported as a plain failure
+@app.exception_handler(PyMongoError)
+async def mongo_error_handler(request: Request, exc: PyMongoError):
+    logger.error("MongoDB error on %s %s: %s", request.method, request.url.path, exc)
+    return ORJSONResponse(
+        {"success": False, "message": "Your request could not be saved."},
+        status_code=500,
+    )
+
+# Static bodies for the test endpoints, serialized once at import
+ROOT_BODY = orjson.dumps({"message": "API is running!"})
+API_ROOT_BODY = orjson.dumps({"message": "API endpoint is working!"})
+
 # Test endpoint
 @app.get("/")
 async def root():
-    return {"message": "API is running!"}
+    return Response(ROOT_BODY, media_type="application/json")
 
 # Test API endpoint
 @app.get("/api")
 async def api_root():
-    return {"message": "API endpoint is working!"}
+    return Response(API_ROOT_BODY, media_type="application/json")
 
 # Submit consultation (POST)
 @app.post("/api/consultation", response_model=ConsultationResponse)
 async def submit_consultation(consultation: ConsultationCreate):
+    doc = consultation.model_dump()
+    doc["submitted_at"] = datetime.utcnow()
+    inserted_id = await queue_insert(doc)
+    return ConsultationResponse(
+        success=True,
+        message="Your consultation request has been submitted successfully!",
+        consultation_id=str(inserted_id)
+    )
+
+# Submit several consultations in one write (POST)
+@app.post("/api/consultations/bulk", response_model=BulkConsultationResponse)
+async def submit_consultations_bulk(
+    consultations: Annotated[List[ConsultationCreate], Body(min_length=1, max_length=1000)],
+):
+    submitted_at = datetime.utcnow()
+    docs = [{**c.model_dump(), "submitted_at": submitted_at} for c in consultations]
+    failed = set()
+    unconfirmed = False
     try:
-        consultation_data = Consultation(**consultation.dict())
-        result = await db.consultations.insert_one(consultation_data.dict())
-        return ConsultationResponse(
-            success=True,
-            message="Your consultation request has been submitted successfully!",
-            consultation_id=str(result.inserted_id)
-        )
-    except Exception as e:
-        return ConsultationResponse(
-            success=False,
-            message=f"Error: {str(e)}"
+        await db.consultations.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Unordered inserts keep going past errors; report which ones failed
+        # so a retry doesn't resubmit the documents that were written
+        failed = {err["index"] for err in e.details.get("writeErrors", [])}
+        # The rest reached the primary, but the write concern wasn't met
+        unconfirmed = bool(e.details.get("writeConcernErrors"))
+    inserted_ids = [str(doc["_id"]) for i, doc in enumerate(docs) if i not in failed]
+    if unconfirmed:
+        message = (
+            f"{len(inserted_ids)} of {len(docs)} consultation requests were written but "
+            "not confirmed by the database; please don't resubmit them."
         )
+    elif failed:
+        message = f"{len(inserted_ids)} of {len(docs)} consultation requests were submitted."
+    else:
+        message = f"{len(inserted_ids)} consultation requests have been submitted successfully!"
+    return BulkConsultationResponse(
+        success=not failed and not unconfirmed,
+        message=message,
+        consultation_ids=inserted_ids,
+        failed_indexes=sorted(failed)
+    )
 
 # Get all consultations (for you to view submissions)
 @app.get("/api/consultations")
-async def get_consultations():
-    consultations = await db.consultations.find().to_list(100)
-    for c in consultations:
-        c["_id"] = str(c["_id"])
-    return consultations
+async def get_consultations(
+    limit: int = Query(25, ge=1, le=100),
+    skip: int = Query(0, ge=0),
+    include_message: bool = False,
+):
+    pipeline = [
+        {"$sort": {"submitted_at": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        # Stringify ObjectIds in Mongo rather than per document in Python
+        {"$addFields": {"_id": {"$toString": "$_id"}}},
+    ]
+    if not include_message:
+        pipeline.append({"$project": {"message": 0}})
+    cursor = await db.consultations.aggregate(pipeline, batchSize=limit)
+    consultations = await cursor.to_list(limit)
+    # Return the Mongo dicts directly so they skip jsonable_encoder
+    return ORJSONResponse(consultations)